@@ -1,67 +1,108 @@
-import json
+import csv
+import os
 import pandas as pd
 from collections import defaultdict
+from multiprocessing import Pool
 
-# Read the TSV file
-df = pd.read_csv('mfp-diaries.tsv', sep='\t', header=None)
+# orjson parses the large nested meals documents several times faster than the stdlib
+try:
+    import orjson as json
+except ImportError:
+    import json
 
-# Define column names based on your data structure
-# Assuming columns are: user_id, date, meals_data, totals_data
-df.columns = ['user_id', 'date', 'meals_data', 'totals_data']
+# Separators for profile keys: unit separator between a nutrient's name and value,
+# record separator between nutrients (neither appears in the MFP data)
+NAME_VALUE_SEP = '\x1f'
+NUTRIENT_SEP = '\x1e'
 
-# Dictionary to store unique food items with their nutritional info
-unique_foods = defaultdict(list)
+def make_sig(nutrients):
+    """Pack a dish's nutrients into one hashable, order-independent profile key"""
+    # A nutrient listed twice keeps its last value, like the nutrient dict this replaced
+    values = {n['name']: n['value'] for n in nutrients}
+    # A missing (None) value is packed as the bare name, so it stays distinct from the
+    # string 'None'. NAME_VALUE_SEP sorts below any printable character, so sorting
+    # the packed strings orders them by nutrient name
+    return NUTRIENT_SEP.join(sorted([
+        name if value is None else f"{name}{NAME_VALUE_SEP}{value}" for name, value in values.items()
+    ]))
 
-# Process each row
-for index, row in df.iterrows():
-    try:
-        # Parse the meals JSON data
-        meals = json.loads(row['meals_data'])
-        
-        # Iterate through meals (assuming each row has one meal with multiple dishes)
-        for meal in meals:
-            if 'dishes' in meal:
-                for dish in meal['dishes']:
-                    food_name = dish['name']
-                    
-                    # Extract nutritional info
-                    nutritions = {}
-                    for nutrient in dish['nutritions']:
-                        # Clean up nutrient values (remove commas from numbers)
-                        try:
-                            value = float(nutrient['value'].replace(',', ''))
-                        except:
-                            value = nutrient['value']
-                        nutritions[nutrient['name']] = value
-                    
-                    # Add to unique foods dictionary
-                    # Store as tuple of (nutrition_dict, count) to track occurrences
-                    found = False
-                    for i, (existing_nutritions, count) in enumerate(unique_foods[food_name]):
-                        if existing_nutritions == nutritions:
-                            unique_foods[food_name][i] = (existing_nutritions, count + 1)
-                            found = True
-                            break
-                    
-                    if not found:
-                        unique_foods[food_name].append((nutritions, 1))
-                        
-    except Exception as e:
-        print(f"Error processing row {index}: {e}")
-
-# Print summary
-print(f"Total unique food items: {len(unique_foods)}\n")
+def split_sig(sig):
+    """Unpack a profile key into (nutrient name, raw value) pairs, with None for a missing value"""
+    if not sig:
+        return []
+    pairs = []
+    for pair in sig.split(NUTRIENT_SEP):
+        name, sep, value = pair.partition(NAME_VALUE_SEP)
+        pairs.append((name, value if sep else None))
+    return pairs
+
+# Most rows handed to one worker process at a time
+CHUNK_ROWS = 10_000
+
+def count_profiles_by_row(meals_chunk, start=0):
+    """Count (food name, profile key) pairs in a chunk of meals JSON, skipping (and reporting) rows it can't parse"""
+    # Bind the hot callables to locals so the inner loop uses LOAD_FAST
+    loads = json.loads
+    make_sig_ = make_sig
+
+    counts = defaultdict(int)
+
+    # Process each row
+    for index, meals_json in enumerate(meals_chunk, start):
+        try:
+            # Parse the meals JSON data
+            meals = loads(meals_json)
+            
+            # Iterate through meals (assuming each row has one meal with multiple dishes)
+            for meal in meals:
+                if 'dishes' in meal:
+                    for dish in meal['dishes']:
+                        # Key each profile by its packed nutritional info so identical
+                        # profiles land in the same bucket and just bump the count
+                        counts[dish['name'], make_sig_(dish['nutritions'])] += 1
+                            
+        except Exception as e:
+            print(f"Error processing row {index}: {e}")
+
+    return [(food_name, sig, count) for (food_name, sig), count in counts.items()]
+
+def count_chunk(chunk):
+    """Pool worker: count the profiles in one (start row, meals JSON) chunk"""
+    start, meals_chunk = chunk
+    return count_profiles_by_row(meals_chunk, start)
+
+def collect_unique_foods(meals_col, processes=None):
+    """Group every dish in the meals column by name and nutritional profile"""
+    # Dictionary to store unique food items with their nutritional info
+    # Maps food name -> {profile key: occurrence count}
+    # Values are kept raw here; clean_nutrient_values() converts them
+    # to numbers in one vectorized pass once all rows are processed
+    unique_foods = defaultdict(lambda: defaultdict(int))
+
+    # Give each worker a few chunks so they finish together, capped at CHUNK_ROWS rows
+    processes = processes or os.cpu_count() or 1
+    chunk_rows = max(1, min(CHUNK_ROWS, -(-len(meals_col) // (processes * 4))))
+    chunks = ((start, meals_col[start:start + chunk_rows]) for start in range(0, len(meals_col), chunk_rows))
 
+    # Parse chunks in separate processes and merge their counts in chunk order,
+    # which keeps foods and 'Profile #' numbering in order of first appearance
+    with Pool(processes) as pool:
+        for counts in pool.imap(count_chunk, chunks):
+            for food_name, sig, count in counts:
+                unique_foods[food_name][sig] += count
+
+    return unique_foods
 
 '''
 # Print all unique food items with their nutritional information
-for food_name, nutritions_list in sorted(unique_foods.items()):
+for food_name, profiles in sorted(unique_foods.items()):
     print(f"\n{'='*80}")
     print(f"Food: {food_name}")
-    print(f"Number of unique nutritional profiles: {len(nutritions_list)}")
+    print(f"Number of unique nutritional profiles: {len(profiles)}")
     
-    for i, (nutritions, count) in enumerate(nutritions_list):
-        if len(nutritions_list) > 1:
+    for i, (profile_key, count) in enumerate(profiles.items()):
+        nutritions = dict(split_sig(profile_key))
+        if len(profiles) > 1:
             print(f"\n  Nutritional Profile #{i+1} (found {count} time(s)):")
         else:
             print(f"\n  Nutritional Information (found {count} time(s)):")
@@ -73,29 +114,70 @@ for food_name, nutritions_list in sorted(unique_foods.items()):
                 value = nutritions[nutrient]
                 print(f"    {nutrient}: {value}")
 '''
+def clean_nutrient_values(unique_foods):
+    """
+    Re-key every profile on cleaned nutrient values, merging profiles that only
+    differed in how a number was written (e.g. '1,000' and '1000')
+    """
+    raw_values = pd.Series(
+        list({
+            value for profiles in unique_foods.values() for profile_key in profiles
+            for _, value in split_sig(profile_key) if value is not None
+        }),
+        dtype=object
+    )
+    # Clean up nutrient values (remove commas from numbers) in one vectorized call.
+    # Always float64, so numbers come out like float() wrote them ('1000.0')
+    stripped = raw_values.str.replace(',', '', regex=False)
+    numeric = pd.to_numeric(stripped, errors='coerce').astype('float64')
+    cleaned = numeric.astype(object)
+    # to_numeric is stricter than float() (e.g. '1_000'), so give what it rejected a second try
+    for i in numeric.index[numeric.isna()]:
+        try:
+            cleaned[i] = float(stripped[i])
+        except ValueError:
+            # Keep the raw value for anything that isn't a number
+            cleaned[i] = raw_values[i]
+    cleaned_values = dict(zip(raw_values, cleaned))
+    # A missing value stays missing (an empty cell in the CSV)
+    cleaned_values[None] = None
+    
+    # Profiles keep their first-appearance order, so 'Profile #' numbering is unchanged
+    cleaned_foods = {}
+    for food_name, profiles in unique_foods.items():
+        cleaned_profiles = cleaned_foods[food_name] = defaultdict(int)
+        for profile_key, count in profiles.items():
+            cleaned_key = tuple((nutrient_name, cleaned_values[value]) for nutrient_name, value in split_sig(profile_key))
+            cleaned_profiles[cleaned_key] += count
+    return cleaned_foods
+
 # Optionally save to CSV
 def save_to_csv(unique_foods, filename='unique_foods_nutrition.csv'):
-    """Save unique foods data to a CSV file"""
-    data = []
-    for food_name, nutritions_list in unique_foods.items():
-        for i, (nutritions, count) in enumerate(nutritions_list):
-            row = {
-                'Food Name': food_name,
-                'Profile #': i+1 if len(nutritions_list) > 1 else 1,
-                'Occurrences': count
-            }
-            # Add all nutrient values
-            for nutrient_name, value in nutritions.items():
-                row[nutrient_name] = value
-            data.append(row)
+    """Stream unique foods data to a CSV file, one row per nutritional profile"""
+    cleaned_foods = clean_nutrient_values(unique_foods)
+    # Nutrient columns in alphabetical order
+    nutrient_names = sorted({
+        nutrient_name for profiles in cleaned_foods.values() for profile_key in profiles for nutrient_name, _ in profile_key
+    })
+    
+    with open(filename, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['Food Name', 'Profile #', 'Occurrences', *nutrient_names])
+        writer.writeheader()
+        for food_name, profiles in cleaned_foods.items():
+            for i, (profile_key, count) in enumerate(profiles.items()):
+                row = {
+                    'Food Name': food_name,
+                    'Profile #': i+1 if len(profiles) > 1 else 1,
+                    'Occurrences': count
+                }
+                # Add all nutrient values (the profile key is a tuple of (name, value) pairs)
+                row.update(profile_key)
+                writer.writerow(row)
     
-    df_output = pd.DataFrame(data)
-    df_output.to_csv(filename, index=False)
     print(f"\nData saved to {filename}")
-    return df_output
 
 # Uncomment to save to CSV
-# output_df = save_to_csv(unique_foods)
+# save_to_csv(unique_foods)
 
 # For a simpler version - just the unique food names
 '''
@@ -105,4 +187,21 @@ print("="*80)
 for i, food_name in enumerate(sorted(unique_foods.keys()), 1):
     print(f"{i:3}. {food_name}")'''
 
-save_to_csv(unique_foods)
\ No newline at end of file
+
+if __name__ == '__main__':
+    # Read the TSV file
+    # (the C engine, not pyarrow: Arrow can't read a row larger than its 1 MB block,
+    # and a full day of meals JSON can exceed that)
+    df = pd.read_csv('mfp-diaries.tsv', sep='\t', header=None)
+
+    # Define column names based on your data structure
+    # Assuming columns are: user_id, date, meals_data, totals_data
+    df.columns = ['user_id', 'date', 'meals_data', 'totals_data']
+
+    # Iterate the raw column values instead of df.iterrows(), which builds a Series per row
+    unique_foods = collect_unique_foods(df['meals_data'].to_numpy())
+
+    # Print summary
+    print(f"Total unique food items: {len(unique_foods)}\n")
+
+    save_to_csv(unique_foods)
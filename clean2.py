@@ -1,22 +1,32 @@
 import pandas as pd
 
-def remove_duplicate_food_names(input_file='nutrition_data.csv', output_file='deduplicated_nutrition.csv'):
+def food_name_hashes(df):
+    """
+    Hash each row's 'Food Name' to a uint64 so dedup works on 8-byte keys
+    instead of long strings.
+    """
+    return pd.util.hash_pandas_object(df['Food Name'], index=False)
+
+def remove_duplicate_food_names(input_file='nutrition_data.csv', output_file='deduplicated_nutrition.csv', df=None):
     """
     Remove rows with duplicate food names, keeping the first occurrence.
     
     Args:
         input_file: Path to input CSV file
         output_file: Path to save deduplicated CSV file
+        df: Already-loaded DataFrame to use instead of reading input_file
     """
-    # Load the CSV file
-    df = pd.read_csv(input_file)
+    # Load the CSV file (unless the caller already did)
+    if df is None:
+        df = pd.read_csv(input_file)
     
     print(f"Original data: {len(df)} rows")
     print(f"Unique food names: {df['Food Name'].nunique()}")
     
     # Remove duplicates based on 'Food Name' column
     # keep='first' keeps the first occurrence, removes subsequent duplicates
-    df_deduplicated = df.drop_duplicates(subset=['Food Name'], keep='first')
+    # (hashed names, so the caller's DataFrame is left untouched)
+    df_deduplicated = df[~food_name_hashes(df).duplicated(keep='first')]
     
     print(f"\nAfter removing duplicates: {len(df_deduplicated)} rows")
     print(f"Removed {len(df) - len(df_deduplicated)} duplicate rows")
@@ -34,40 +44,43 @@ def remove_duplicate_food_names(input_file='nutrition_data.csv', output_file='de
     
     return df_deduplicated
 
-def remove_duplicates_and_summarize(input_file='nutrition_data.csv', output_file='deduplicated_with_summary.csv'):
+def remove_duplicates_and_summarize(input_file='nutrition_data.csv', output_file='deduplicated_with_summary.csv', df=None):
     """
     Remove duplicates and create a summary of what was removed.
+    Pass df to reuse an already-loaded DataFrame instead of reading input_file.
     """
-    # Load the data
-    df = pd.read_csv(input_file)
+    # Load the data (unless the caller already did)
+    if df is None:
+        df = pd.read_csv(input_file)
     
     print(f"Processing {input_file}...")
     print(f"Total rows: {len(df)}")
     
-    # Identify duplicates
-    duplicate_mask = df.duplicated(subset=['Food Name'], keep='first')
+    # Identify duplicates (hash the names once and reuse them for the summary)
+    name_hashes = food_name_hashes(df)
+    duplicate_mask = name_hashes.duplicated(keep='first')
     duplicates = df[duplicate_mask]
     unique_df = df[~duplicate_mask]
     
     print(f"\nFound {len(duplicates)} duplicate rows to remove")
     print(f"Keeping {len(unique_df)} unique rows")
     
-    # Create a summary of removed duplicates
-    summary = []
-    for food_name in duplicates['Food Name'].unique():
-        food_duplicates = duplicates[duplicates['Food Name'] == food_name]
-        kept_row = unique_df[unique_df['Food Name'] == food_name]
-        
-        if len(kept_row) > 0:
-            summary.append({
-                'Food Name': food_name,
-                'Removed Count': len(food_duplicates),
-                'Kept Profile #': kept_row.iloc[0]['Profile #'] if 'Profile #' in kept_row.columns else 'N/A',
-                'Kept Occurrences': kept_row.iloc[0]['Occurrences'] if 'Occurrences' in kept_row.columns else 'N/A'
-            })
+    # Create a summary of removed duplicates with a single hash-based groupby,
+    # in order of each name's first removed row
+    # (rows without a name are left out, as before)
+    removed_hashes = name_hashes[duplicate_mask & df['Food Name'].notna()]
+    removed_counts = removed_hashes.groupby(removed_hashes, sort=False).size()
+    
+    # unique_df holds exactly the first row for each name, i.e. the kept one
+    kept_rows = unique_df.set_index(name_hashes[~duplicate_mask]).loc[removed_counts.index]
     
     # Create summary DataFrame
-    summary_df = pd.DataFrame(summary)
+    summary_df = pd.DataFrame({
+        'Food Name': kept_rows['Food Name'].values,
+        'Removed Count': removed_counts.values,
+        'Kept Profile #': kept_rows['Profile #'].values if 'Profile #' in kept_rows.columns else 'N/A',
+        'Kept Occurrences': kept_rows['Occurrences'].values if 'Occurrences' in kept_rows.columns else 'N/A'
+    })
     
     # Save the deduplicated data
     unique_df.to_csv(output_file, index=False)
@@ -95,7 +108,7 @@ def simple_deduplicate(input_file='nutrition_data.csv'):
     Simple one-line deduplication.
     """
     df = pd.read_csv(input_file)
-    df_unique = df.drop_duplicates(subset=['Food Name'])
+    df_unique = df[~food_name_hashes(df).duplicated(keep='first')]
     
     output_file = 'simple_deduplicated.csv'
     df_unique.to_csv(output_file, index=False)
@@ -123,15 +136,18 @@ if __name__ == "__main__":
     print("="*60)
     
     try:
+        # Load the input once and share it between both passes
+        df = pd.read_csv(input_file, engine='pyarrow')
+        
         # Option 1: Simple deduplication (keeps first occurrence)
         print("\n1. Running simple deduplication...")
-        dedup_df = remove_duplicate_food_names(input_file, 'deduplicated_nutrition.csv')
+        dedup_df = remove_duplicate_food_names(input_file, 'deduplicated_nutrition.csv', df=df)
         
         print("\n" + "="*60)
         
         # Option 2: With detailed summary
         print("\n2. Running detailed deduplication with summary...")
-        unique_df, summary_df = remove_duplicates_and_summarize(input_file, 'deduplicated_detailed.csv')
+        unique_df, summary_df = remove_duplicates_and_summarize(input_file, 'deduplicated_detailed.csv', df=df)
         
         print("\n" + "="*60)
         print("DEDUPLICATION COMPLETE!")
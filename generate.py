@@ -1,10 +1,19 @@
-import requests
+import aiohttp
+import asyncio
 import json
-import time
+import math
 import re
+from collections import Counter
 
 LM_STUDIO_URL = "http://localhost:1234/v1/chat/completions"
 HEADERS = {"Content-Type": "application/json"}
+_NON_NUMERIC_RE = re.compile(r'[^\d.]')
+
+# Keep one request in flight while the previous response is being parsed
+MAX_CONCURRENT_REQUESTS = 2
+# Seconds a request slot stays busy after a call (rate limiting) or a failed call
+REQUEST_INTERVAL = 2
+ERROR_INTERVAL = 3
 
 # Your existing foods (simplified list for checking)
 EXISTING_FOODS = [
@@ -20,14 +29,92 @@ EXISTING_FOODS = [
     "Tofu (Extra Firm)"
 ]
 
+# Escape single quotes by doubling them
+_SQL_ESCAPE = str.maketrans({"'": "''"})
+
+# Start of the food_catalog insert; VALUES rows are appended after it
+SQL_INSERT_HEADER = """INSERT INTO public.food_catalog (
+  name, 
+  brand, 
+  calories, 
+  protein, 
+  carbs, 
+  fat, 
+  fiber, 
+  sugar, 
+  serving_size, 
+  serving_unit, 
+  confidence, 
+  popularity, 
+  category
+) VALUES 
+"""
+
+# One VALUES row of the food_catalog insert
+_SQL_ROW_TEMPLATE = "('{}', '{}', {}, {}, {}, {}, {}, {}, {}, '{}', '{}', {}, '{}')"
+
+def normalize_food_name(name):
+    """Case- and whitespace-insensitive key used to spot duplicate foods"""
+    return ' '.join(name.casefold().split())
+
+EXISTING_FOOD_KEYS = frozenset(normalize_food_name(name) for name in EXISTING_FOODS)
+
 def escape_sql_string(text):
     """Properly escape SQL strings"""
     if text is None:
         return ''
-    # Escape single quotes by doubling them
-    return text.replace("'", "''")
+    return text.translate(_SQL_ESCAPE)
+
+def format_sql_row(food):
+    """Format a cleaned food as one VALUES row"""
+    return _SQL_ROW_TEMPLATE.format(
+        escape_sql_string(food['name']),
+        escape_sql_string(food['brand']),
+        food['calories'],
+        food['protein'],
+        food['carbs'],
+        food['fat'],
+        food['fiber'],
+        food['sugar'],
+        food['serving_size'],
+        escape_sql_string(food['serving_unit']),
+        escape_sql_string(food['confidence']),
+        food['popularity'],
+        escape_sql_string(food['category'])
+    )
 
-def query_llm(prompt):
+class FoodWriter:
+    """Append each accepted food to the SQL and JSONL outputs as soon as it's generated"""
+    
+    def __init__(self, sql_path='generated_foods.sql', jsonl_path='generated_foods.jsonl'):
+        self.sql_path = sql_path
+        self.jsonl_path = jsonl_path
+        self.sql_file = None
+        self.jsonl_file = None
+    
+    def write(self, food):
+        # Open lazily so a session that finds nothing leaves no half-written INSERT behind
+        if self.sql_file is None:
+            self.sql_file = open(self.sql_path, 'w', encoding='utf-8')
+            self.jsonl_file = open(self.jsonl_path, 'w', encoding='utf-8')
+            self.sql_file.write(SQL_INSERT_HEADER + format_sql_row(food))
+        else:
+            self.sql_file.write(",\n" + format_sql_row(food))
+        self.jsonl_file.write(json.dumps(food, ensure_ascii=False) + "\n")
+        
+        # Flush so the files are usable even if the session is killed
+        self.sql_file.flush()
+        self.jsonl_file.flush()
+    
+    def close(self):
+        if self.sql_file is None:
+            return
+        # Terminate the INSERT statement
+        self.sql_file.write(";\n")
+        self.sql_file.close()
+        self.jsonl_file.close()
+
+async def query_llm(session, prompt):
     payload = {
         "model": "local-model",
         "messages": [
@@ -43,43 +130,67 @@ def query_llm(prompt):
         "temperature": 0.8
     }
     
-    response = requests.post(LM_STUDIO_URL, headers=HEADERS, json=payload)
-    return response.json()["choices"][0]["message"]["content"]
+    async with session.post(LM_STUDIO_URL, json=payload) as response:
+        return (await response.json())["choices"][0]["message"]["content"]
+
+async def fetch_iteration(session, semaphore, iteration):
+    """Query the LLM for one iteration once a request slot is free"""
+    await semaphore.acquire()
+    delay = REQUEST_INTERVAL
+    try:
+        print(f"  Querying LLM (iteration {iteration})...")
+        return await query_llm(session, build_prompt(iteration))
+    except Exception:
+        delay = ERROR_INTERVAL
+        raise
+    finally:
+        # Hand the response back right away but keep the slot busy for the rate limit
+        asyncio.get_running_loop().call_later(delay, semaphore.release)
+
+def iter_json_objects(text):
+    """Yield every named JSON object embedded in text, including multi-line ones"""
+    decoder = json.JSONDecoder()
+    i = 0
+    while True:
+        start = text.find('{', i)
+        if start == -1:
+            return
+        try:
+            obj, end = decoder.raw_decode(text, start)
+        except json.JSONDecodeError:
+            i = start + 1
+            continue
+        if 'name' in obj:
+            yield obj
+            i = end
+        else:
+            # A wrapper such as {"foods": [...]}: look for the foods inside it
+            i = start + 1
 
 def clean_numeric_value(value, default=0):
     """Clean and convert numeric values"""
     if value is None:
         return default
     try:
+        # Most values already arrive as JSON numbers. NaN/Infinity and booleans
+        # go through the regex below instead, which turns them into the default
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+            return float(value)
         # Remove any non-numeric characters except decimal point
-        cleaned = re.sub(r'[^\d.]', '', str(value))
+        cleaned = _NON_NUMERIC_RE.sub('', str(value))
         if cleaned:
             return float(cleaned)
         return default
-    except:
+    except (ValueError, OverflowError):
         return default
 
-def main():
-    print("Starting continuous gym food generation...")
-    print("Press Ctrl+C to stop when no more foods are being generated.")
-    print("-" * 60)
-    
-    generated_foods = []
-    existing_names = set(EXISTING_FOODS)
-    
-    iteration = 0
-    max_empty_iterations = 10
-    empty_iterations = 0
-    
-    while empty_iterations < max_empty_iterations:
-        iteration += 1
-        print(f"\n📋 Iteration {iteration}")
-        
-        # Create a diverse prompt each time
-        categories = ["High-protein snacks", "Pre-workout meals", "Post-workout recovery", 
-                     "Low-carb options", "Vegan fitness foods", "Bulking foods", "Cutting foods"]
-        
-        prompt = f"""Generate 10 COMPLETELY NEW gym foods in the category: {categories[iteration % len(categories)]}
+# Rotate through these so each prompt asks for a different kind of food
+CATEGORIES = ["High-protein snacks", "Pre-workout meals", "Post-workout recovery", 
+              "Low-carb options", "Vegan fitness foods", "Bulking foods", "Cutting foods"]
+
+def build_prompt(iteration):
+    """Create a diverse prompt for each iteration"""
+    return f"""Generate 10 COMPLETELY NEW gym foods in the category: {CATEGORIES[iteration % len(CATEGORIES)]}
         
         These must be foods that serious weightlifters and bodybuilders actually eat, but aren't in basic food databases.
         Include specific product names and brands.
@@ -100,71 +211,103 @@ def main():
         }}
         
         Generate 10 unique items:"""
-        
+
+async def generate_foods(generated_foods, writer):
+    """Query the LLM until it stops producing new foods, recording each one as it arrives"""
+    existing_names = set(EXISTING_FOOD_KEYS)
+    
+    iteration = 0
+    max_empty_iterations = 10
+    empty_iterations = 0
+    
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_REQUESTS)
+    timeout = aiohttp.ClientTimeout(total=120)
+    
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector, timeout=timeout) as session:
+        pending = {}
         try:
-            print("  Querying LLM...")
-            response = query_llm(prompt)
-            
-            # Try to parse JSON from response
-            lines = response.strip().split('\n')
-            new_count = 0
-            
-            for line in lines:
-                line = line.strip()
-                if line.startswith('{') and line.endswith('}'):
+            while empty_iterations < max_empty_iterations:
+                # Keep the next iterations queued so a request is always in flight
+                while len(pending) < MAX_CONCURRENT_REQUESTS:
+                    iteration += 1
+                    task = asyncio.create_task(fetch_iteration(session, semaphore, iteration))
+                    pending[task] = iteration
+                
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                
+                for task in done:
+                    task_iteration = pending.pop(task)
+                    print(f"\n📋 Iteration {task_iteration}")
+                    
                     try:
-                        food = json.loads(line)
-                        food_name = food.get('name', '').strip()
-                        
-                        if food_name and food_name not in existing_names:
-                            # Clean and validate all values
-                            cleaned_food = {
-                                'name': food_name,
-                                'brand': food.get('brand', 'Generic').strip(),
-                                'calories': clean_numeric_value(food.get('calories'), 0),
-                                'protein': clean_numeric_value(food.get('protein'), 0),
-                                'carbs': clean_numeric_value(food.get('carbs'), 0),
-                                'fat': clean_numeric_value(food.get('fat'), 0),
-                                'fiber': clean_numeric_value(food.get('fiber'), 0),
-                                'sugar': clean_numeric_value(food.get('sugar'), 0),
-                                'serving_size': clean_numeric_value(food.get('serving_size'), 100),
-                                'serving_unit': food.get('serving_unit', 'g').strip(),
-                                'category': food.get('category', 'Unknown').strip(),
-                                'confidence': 'estimated',
-                                'popularity': 50
-                            }
-                            
-                            generated_foods.append(cleaned_food)
-                            existing_names.add(food_name)
-                            new_count += 1
-                            
-                            print(f"  ✓ {food_name[:50]}...")
+                        response = task.result()
                     except Exception as e:
-                        print(f"  ✗ Error parsing: {e}")
+                        print(f"  Error: {e}")
                         continue
-            
-            if new_count > 0:
-                empty_iterations = 0
-                print(f"  Added {new_count} new foods")
-            else:
-                empty_iterations += 1
-                print(f"  No new foods this iteration ({empty_iterations}/{max_empty_iterations})")
-            
-            # Save progress every 5 iterations
-            if iteration % 5 == 0 and generated_foods:
-                with open(f'generated_foods_iter_{iteration}.json', 'w') as f:
-                    json.dump(generated_foods, f, indent=2)
-                print(f"  💾 Saved checkpoint with {len(generated_foods)} foods")
-            
-            # Rate limiting
-            time.sleep(2)
-            
-        except KeyboardInterrupt:
-            print("\n\nStopped by user.")
-            break
-        except Exception as e:
-            print(f"  Error: {e}")
-            time.sleep(3)
+                    
+                    # Pull every JSON object out of the response, even pretty-printed ones
+                    new_count = 0
+                    
+                    for food in iter_json_objects(response):
+                        try:
+                            food_name = food.get('name', '').strip()
+                            name_key = normalize_food_name(food_name)
+                    
+                            if name_key and name_key not in existing_names:
+                                # Clean and validate all values
+                                cleaned_food = {
+                                    'name': food_name,
+                                    'brand': food.get('brand', 'Generic').strip(),
+                                    'calories': clean_numeric_value(food.get('calories'), 0),
+                                    'protein': clean_numeric_value(food.get('protein'), 0),
+                                    'carbs': clean_numeric_value(food.get('carbs'), 0),
+                                    'fat': clean_numeric_value(food.get('fat'), 0),
+                                    'fiber': clean_numeric_value(food.get('fiber'), 0),
+                                    'sugar': clean_numeric_value(food.get('sugar'), 0),
+                                    'serving_size': clean_numeric_value(food.get('serving_size'), 100),
+                                    'serving_unit': food.get('serving_unit', 'g').strip(),
+                                    'category': food.get('category', 'Unknown').strip(),
+                                    'confidence': 'estimated',
+                                    'popularity': 50
+                                }
+                    
+                                generated_foods.append(cleaned_food)
+                                writer.write(cleaned_food)
+                                existing_names.add(name_key)
+                                new_count += 1
+                    
+                                print(f"  ✓ {food_name[:50]}...")
+                        except Exception as e:
+                            print(f"  ✗ Error parsing: {e}")
+                            continue
+                    
+                    if new_count > 0:
+                        empty_iterations = 0
+                        print(f"  Added {new_count} new foods")
+                    else:
+                        empty_iterations += 1
+                        print(f"  No new foods this iteration ({empty_iterations}/{max_empty_iterations})")
+
+        finally:
+            # Drop any queued iterations once we're done (or interrupted)
+            for task in pending:
+                task.cancel()
+
+def main():
+    print("Starting continuous gym food generation...")
+    print("Press Ctrl+C to stop when no more foods are being generated.")
+    print("-" * 60)
+    
+    generated_foods = []
+    writer = FoodWriter()
+    
+    try:
+        asyncio.run(generate_foods(generated_foods, writer))
+    except KeyboardInterrupt:
+        print("\n\nStopped by user.")
+    finally:
+        writer.close()
     
     # Final output
     print(f"\n{'='*60}")
@@ -173,57 +316,20 @@ def main():
     print(f"\nTotal unique foods generated: {len(generated_foods)}")
     
     if generated_foods:
-        # Generate SQL with proper escaping
-        sql_lines = []
-        for food in generated_foods:
-            sql = f"('{escape_sql_string(food['name'])}', '{escape_sql_string(food['brand'])}', {food['calories']}, {food['protein']}, {food['carbs']}, {food['fat']}, {food['fiber']}, {food['sugar']}, {food['serving_size']}, '{escape_sql_string(food['serving_unit'])}', '{escape_sql_string(food['confidence'])}', {food['popularity']}, '{escape_sql_string(food['category'])}'),"
-            sql_lines.append(sql)
-        
-        sql_output = """INSERT INTO public.food_catalog (
-  name, 
-  brand, 
-  calories, 
-  protein, 
-  carbs, 
-  fat, 
-  fiber, 
-  sugar, 
-  serving_size, 
-  serving_unit, 
-  confidence, 
-  popularity, 
-  category
-) VALUES 
-""" + "\n".join(sql_lines)
-        
-        # Remove the last comma and add semicolon
-        sql_output = sql_output.rstrip(',') + ";"
-        
-        # Save SQL file
-        with open('generated_foods.sql', 'w', encoding='utf-8') as f:
-            f.write(sql_output)
-        
-        # Save JSON for reference
-        with open('generated_foods.json', 'w', encoding='utf-8') as f:
-            json.dump(generated_foods, f, indent=2, ensure_ascii=False)
-        
         print(f"\n💾 Files saved:")
         print(f"  - generated_foods.sql (SQL INSERT statements)")
-        print(f"  - generated_foods.json (JSON format)")
+        print(f"  - generated_foods.jsonl (JSON format, one food per line)")
         
         # Show some stats
-        categories = {}
-        for food in generated_foods:
-            cat = food['category']
-            categories[cat] = categories.get(cat, 0) + 1
+        categories = Counter(food['category'] for food in generated_foods)
         
         print(f"\n📊 Category breakdown:")
-        for cat, count in sorted(categories.items(), key=lambda x: x[1], reverse=True):
+        for cat, count in categories.most_common():
             print(f"  {cat}: {count} foods")
         
         # Show sample SQL
         print(f"\n📝 Sample SQL (first 3 inserts):")
-        sample_sql = "INSERT INTO public.food_catalog (...) VALUES \n" + "\n".join(sql_lines[:3]) + "\n... (truncated)"
+        sample_sql = "INSERT INTO public.food_catalog (...) VALUES \n" + ",\n".join(format_sql_row(food) for food in generated_foods[:3]) + "\n... (truncated)"
         print(sample_sql)
         
         # Show sample foods